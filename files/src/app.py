@@ -1,11 +1,26 @@
 import streamlit as st
 import google.generativeai as genai
 import os
+import time
 from dotenv import load_dotenv
 
 # 1. 加载环境变量 (如果你在本地有 .env 文件)
 load_dotenv()
 
+
+@st.cache_resource
+def get_model(api_key: str, system_instruction: str, model_name: str):
+    """按 (api_key, system_instruction, model_name) 缓存模型实例。
+
+    Streamlit 每次交互都会重跑整个脚本，不缓存的话每次 rerun 都要
+    重新 configure SDK、重建 HTTP 客户端。
+    """
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(
+        model_name=model_name,
+        system_instruction=system_instruction,
+    )
+
 # 2. 页面基础配置
 st.set_page_config(
     page_title="AI Soul Studio",
@@ -57,20 +72,19 @@ with st.sidebar:
     
     if st.button("🗑️ 清空聊天记忆"):
         st.session_state.messages = []
+        st.session_state.pop("chat", None)
+        st.session_state.pop("chat_model", None)
         st.rerun()
 
 # --- 3. 初始化聊天引擎 ---
 
 if api_key:
     try:
-        genai.configure(api_key=api_key)
-        # 使用 gemini-1.5-flash，速度快且免费额度高，适合聊天
-        model = genai.GenerativeModel(
-            model_name="gemini-2.5-flash",
-            system_instruction=system_instruction
-        )
+        # 使用 gemini-2.5-flash，速度快且免费额度高，适合聊天
+        model = get_model(api_key, system_instruction, "gemini-2.5-flash")
     except Exception as e:
         st.error(f"API Key 配置出错: {e}")
+        st.stop()
 else:
     st.warning("请在侧边栏输入 Google Gemini API Key 才能开始聊天。")
     st.stop()
@@ -83,6 +97,18 @@ st.title(f"💬 与 {target_name} 的聊天")
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# 持久化 chat 对象：让 SDK 增量维护对话历史，
+# 避免每轮发送时重新构造并序列化整个 history。
+# 模型变化时（比如用户改了灵魂指令，get_model 返回了新实例）
+# 需要基于新模型重建 chat 并回放已有消息，否则旧 system prompt 会一直生效
+if "chat" not in st.session_state or st.session_state.get("chat_model") is not model:
+    history_for_gemini = [
+        {"role": "user" if m["role"] == "user" else "model", "parts": [m["content"]]}
+        for m in st.session_state.messages
+    ]
+    st.session_state.chat = model.start_chat(history=history_for_gemini)
+    st.session_state.chat_model = model
+
 # 显示历史消息
 for message in st.session_state.messages:
     # 区分 User 和 Assistant 的头像
@@ -100,27 +126,28 @@ if prompt := st.chat_input("发消息..."):
 
     # B. AI 生成回复
     try:
-        # 将 Streamlit 的历史记录转换为 Gemini 的格式
-        history_for_gemini = [
-            {"role": "user" if m["role"] == "user" else "model", "parts": [m["content"]]}
-            for m in st.session_state.messages[:-1] # 不包含最新的一条，因为我们下面要单独发
-        ]
-        
-        chat = model.start_chat(history=history_for_gemini)
-        
         with st.chat_message("assistant", avatar="✨"):
             # 使用流式输出 (Stream) 模拟打字效果
             response_placeholder = st.empty()
             full_response = ""
             
-            # 发送消息
-            response_stream = chat.send_message(prompt, stream=True, generation_config={"temperature": temperature})
+            # 发送消息（chat 对象已持久化在 session_state，历史由 SDK 增量维护）
+            response_stream = st.session_state.chat.send_message(prompt, stream=True, generation_config={"temperature": temperature})
             
+            # 批量刷新：每 8 个 chunk 或每 30ms 才重绘一次，
+            # 避免每个 token 都触发一次 websocket 往返 + DOM 重排
+            pending = 0
+            last_flush = time.monotonic()
             for chunk in response_stream:
                 if chunk.text:
                     full_response += chunk.text
-                    response_placeholder.markdown(full_response + "▌")
-            
+                    pending += 1
+                    now = time.monotonic()
+                    if pending >= 8 or now - last_flush > 0.03:
+                        response_placeholder.markdown(full_response + "▌")
+                        pending = 0
+                        last_flush = now
+
             response_placeholder.markdown(full_response)
         
         # C. 保存 AI 回复到历史
@@ -6,9 +6,13 @@ the chat completions API when available, falling back to text generation.
 It attempts to be defensive about different SDK response shapes.
 """
 
+import asyncio
+import hashlib
 import os
+import random
 import time
-from typing import List, Dict, Optional, Any
+from functools import lru_cache
+from typing import List, Dict, Optional, Any, Tuple
 
 try:
     import google.generativeai as genai
@@ -16,6 +20,34 @@ except Exception:
     genai = None
 
 
+# Fast-path extractors keyed by response class name. Known SDK response
+# types resolve with one dict lookup plus one attribute chain instead of
+# walking the hasattr/try ladder in _slow_extract.
+_EXTRACTORS: Dict[str, Any] = {
+    "ChatCompletion": lambda r: r.choices[0].message.content,
+    "Completion": lambda r: r.choices[0].text,
+    "GenerateTextResponse": lambda r: r.candidates[0].output,
+    "GenerateContentResponse": lambda r: r.text,
+}
+
+
+@lru_cache(maxsize=128)
+def _build_prompt_cached(persona_desc: str, mem_tuple: Tuple[Tuple[str, str], ...], user_input: str) -> str:
+    """Format the prompt from hashable inputs; cached on exact repeats.
+
+    Message edits and retries resend identical (persona, memories, input)
+    tuples, so caching skips the reformatting work for free.
+    """
+    history_block = "\n".join(
+        f"{sender}: {content}" for sender, content in reversed(mem_tuple)
+    )
+    persona_block = f"Personality: {persona_desc}\n\n" if persona_desc else ""
+    return (
+        f"{persona_block}Conversation history (most recent first):\n"
+        f"{history_block}\n\nUser: {user_input}\nAssistant:"
+    )
+
+
 class GeminiBot:
     """
     Wrapper around Google Generative AI (Gemini) Python SDK.
@@ -29,6 +61,10 @@ class GeminiBot:
     def __init__(self, api_key: Optional[str] = None, model: str = "models/gemini-1.5"):
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         self.model = model
+        # Server-side cache of the constant prompt prefix (persona + history),
+        # created lazily and rebuilt when the prefix changes.
+        self._cache: Optional[Any] = None
+        self._cache_key: Optional[str] = None
 
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY not set. Please set it in environment or pass api_key")
@@ -57,17 +93,10 @@ class GeminiBot:
         """
         MAX_EXAMPLES = 6
         chosen = memories[-MAX_EXAMPLES:] if memories else []
-        lines: List[str] = []
-        if persona_desc:
-            lines.append(f"Personality: {persona_desc}\n")
-        lines.append("Conversation history (most recent first):")
-        for m in reversed(chosen):
-            sender = m.get("sender", "Unknown")
-            content = m.get("content", "")
-            lines.append(f"{sender}: {content}")
-        lines.append("\nUser: " + user_input)
-        lines.append("Assistant:")
-        return "\n".join(lines)
+        mem_tuple = tuple(
+            (m.get("sender", "Unknown"), m.get("content", "")) for m in chosen
+        )
+        return _build_prompt_cached(persona_desc, mem_tuple, user_input)
 
     def _call_chat_api(self, prompt: str, max_output_tokens: int, temperature: float) -> Any:
         """Call the chat completions API if available.
@@ -97,7 +126,21 @@ class GeminiBot:
         )
 
     def _extract_text(self, response: Any) -> str:
-        """Attempt to extract text from several common response shapes."""
+        """Extract text from a response object.
+
+        Known SDK response types are dispatched through _EXTRACTORS in O(1);
+        anything else falls back to the generic shape-probing walker.
+        """
+        fn = _EXTRACTORS.get(type(response).__name__)
+        if fn is not None:
+            try:
+                return fn(response)
+            except Exception:
+                pass
+        return self._slow_extract(response)
+
+    def _slow_extract(self, response: Any) -> str:
+        """Generic fallback: probe several common response shapes."""
         # 1) genai.chat.completions.create typical shape: response.choices[0].message.content
         try:
             # attribute access
@@ -150,31 +193,158 @@ class GeminiBot:
         # 4) fallback to str
         return str(response)
 
-    def generate_response(self, prompt: str, max_output_tokens: int = 512, temperature: float = 0.7, retry: int = 2) -> str:
-        """Call the Gemini model and return text response.
+    def _call_blocking_api(self, prompt: str, max_output_tokens: int, temperature: float) -> str:
+        """Single blocking call: chat completions if available, else text generation."""
+        if genai and hasattr(genai, "chat") and hasattr(genai.chat, "completions"):
+            resp = self._call_chat_api(prompt, max_output_tokens, temperature)
+        else:
+            resp = self._call_text_api(prompt, max_output_tokens, temperature)
+
+        if resp is None:
+            raise RuntimeError("Empty response from model")
+
+        return self._extract_text(resp)
+
+    def _get_cached_model(self, prefix: str) -> Optional[Any]:
+        """Return a model bound to a server-side cache of `prefix`, or None.
+
+        The cache skips prefill compute for the cached tokens on every
+        subsequent call, which lowers time to first token and per-call cost
+        when the same persona/history prefix is resent each turn. The cache
+        is keyed on a hash of the prefix and rebuilt whenever it changes.
+        Returns None (caller sends the full prompt) if the SDK has no
+        caching support or cache creation fails.
+        """
+        if genai is None or not hasattr(genai, "caching"):
+            return None
+
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        if key != self._cache_key:
+            if self._cache is not None:
+                try:
+                    self._cache.delete()
+                except Exception:
+                    pass
+                self._cache = None
+                self._cache_key = None
+            try:
+                self._cache = genai.caching.CachedContent.create(
+                    model=self.model,
+                    contents=[prefix],
+                    ttl="600s",
+                )
+                self._cache_key = key
+            except Exception:
+                return None
+
+        try:
+            return genai.GenerativeModel.from_cached_content(cached_content=self._cache)
+        except Exception:
+            return None
+
+    def stream_response(self, prompt: str, max_output_tokens: int = 512, temperature: float = 0.7,
+                        cached_prefix: Optional[str] = None):
+        """Yield response text incrementally as the model decodes.
+
+        Streaming trades a little total throughput for much lower time to
+        first token: the caller can render (or relay) text while the model
+        is still generating instead of blocking for the full decode. Falls
+        back to a single blocking call (one yield) when the installed SDK
+        has no streaming interface.
+
+        When `cached_prefix` is given, that text is pushed into Gemini's
+        context cache and `prompt` should contain only the per-turn suffix
+        (the user message); the server skips re-prefilling the prefix.
+        """
+        if genai is not None and hasattr(genai, "GenerativeModel"):
+            model = None
+            if cached_prefix:
+                model = self._get_cached_model(cached_prefix)
+            if model is None:
+                model = genai.GenerativeModel(self.model)
+                if cached_prefix:
+                    # no caching support: fold the prefix back into the prompt
+                    prompt = cached_prefix + prompt
+            resp = model.generate_content(
+                prompt,
+                stream=True,
+                generation_config={
+                    "max_output_tokens": max_output_tokens,
+                    "temperature": temperature,
+                },
+            )
+            for chunk in resp:
+                text = getattr(chunk, "text", "")
+                if text:
+                    yield text
+            return
+
+        if cached_prefix:
+            prompt = cached_prefix + prompt
+        yield self._call_blocking_api(prompt, max_output_tokens, temperature)
+
+    def generate_response(self, prompt: str, max_output_tokens: int = 512, temperature: float = 0.7, retry: int = 2,
+                          cached_prefix: Optional[str] = None) -> str:
+        """Call the Gemini model and return the full text response.
 
-        The method will try chat completions first (if available on the SDK), then
-        fallback to text generation. It retries on exceptions using a small backoff.
+        Thin blocking wrapper over stream_response for callers that want the
+        complete reply. It retries on exceptions using a small backoff.
         """
         last_exc: Optional[Exception] = None
         for attempt in range(retry + 1):
             try:
-                # Prefer chat API when available
-                if genai and hasattr(genai, "chat") and hasattr(genai.chat, "completions"):
-                    resp = self._call_chat_api(prompt, max_output_tokens, temperature)
-                else:
-                    resp = self._call_text_api(prompt, max_output_tokens, temperature)
+                return "".join(self.stream_response(prompt, max_output_tokens, temperature,
+                                                    cached_prefix=cached_prefix))
+            except Exception as e:
+                last_exc = e
+                # exponential backoff with jitter so concurrent clients
+                # don't retry in lockstep against a struggling endpoint
+                time.sleep(min(10, (2 ** attempt) + random.random()))
+                continue
+
+        raise RuntimeError(f"Model call failed after retries: {last_exc}")
 
-                if resp is None:
-                    raise RuntimeError("Empty response from model")
+    async def astream_response(self, prompt: str, max_output_tokens: int = 512, temperature: float = 0.7):
+        """Async counterpart of stream_response.
+
+        Yields chunk text from the SDK's native async streaming interface,
+        so N concurrent calls (parallel personas, N-best regeneration) can
+        share one event loop and overlap their network I/O instead of each
+        blocking a thread. Requires an SDK with GenerativeModel support.
+        """
+        if genai is None or not hasattr(genai, "GenerativeModel"):
+            raise RuntimeError("async streaming requires an SDK with GenerativeModel support")
+        model = genai.GenerativeModel(self.model)
+        resp = await model.generate_content_async(
+            prompt,
+            stream=True,
+            generation_config={
+                "max_output_tokens": max_output_tokens,
+                "temperature": temperature,
+            },
+        )
+        async for chunk in resp:
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
 
-                text = self._extract_text(resp)
-                return text
+    async def agenerate_response(self, prompt: str, max_output_tokens: int = 512, temperature: float = 0.7,
+                                 retry: int = 2) -> str:
+        """Async counterpart of generate_response; same retry/backoff policy.
 
+        Use with asyncio.gather to fan several generations out concurrently;
+        sync callers should keep using generate_response.
+        """
+        last_exc: Optional[Exception] = None
+        for attempt in range(retry + 1):
+            try:
+                parts: List[str] = []
+                async for text in self.astream_response(prompt, max_output_tokens, temperature):
+                    parts.append(text)
+                return "".join(parts)
             except Exception as e:
                 last_exc = e
-                # simple exponential-ish backoff
-                time.sleep(min(10, 1 + attempt * 2))
+                await asyncio.sleep(min(10, (2 ** attempt) + random.random()))
                 continue
 
         raise RuntimeError(f"Model call failed after retries: {last_exc}")
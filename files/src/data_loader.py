@@ -10,47 +10,183 @@
 - 不要在仓库中提交 raw_chat.txt 或 clean_memory.json（data/ 目录应在 .gitignore 中）
 """
 
+import mmap
 import re
 import json
 from pathlib import Path
 from typing import List, Dict
 import pandas as pd
 
-CHAT_LINE_RE = re.compile(r'^\[(?P<time>.*?)\]\s*(?P<sender>.*?):\s*(?P<content>.*)$')
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def parse_raw_chat(file_path: str) -> pd.DataFrame:
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+    njit = None
+
+# 多行模式：延续行的负向前瞻匹配完整消息头（[时间] 发送者:），
+# 这样以 [流泪] 等表情开头的延续行仍归属上一条消息；time/sender
+# 字符类排除换行，消息头内部的空白用 [^\S\n]（\s 会匹配 \n，
+# 空内容消息会把下一条消息吞进来），避免匹配跨行吞掉下一条消息。
+# 整个文件只需一次 C 级正则扫描，无需逐行处理。
+# 用 bytes 模式配合 mmap：零拷贝读文件，只对命中的三个分组做 UTF-8 解码
+CHAT_LINE_RE = re.compile(
+    rb'^\[(?P<time>[^\]\n]+)\][^\S\n]*(?P<sender>[^:\n]+):[^\S\n]*'
+    rb'(?P<content>.*(?:\n(?!\[[^\]\n]+\][^\S\n]*[^:\n]+:).*)*)',
+    re.MULTILINE,
+)
+
+# 清洗用正则统一在模块级编译一次，避免每次调用都走 re 的缓存查找
+_PHONE_RE = re.compile(r'\b1\d{10}\b')
+_WS_RE = re.compile(r'\s+')
+# 单字符 \w 判断，用于校验 JIT 扫描候选的多字节邻居是否构成单词边界
+_WORD_RE = re.compile(r'\w')
+
+if njit is not None:
+    @njit(cache=True)
+    def _phone_starts(buf):
+        """在 UTF-8 字节缓冲中找出手机号（1 开头的 11 位数字）的候选起始偏移。
+
+        字节级只排除确定的非边界：邻居是 ASCII 单词字节（数字/字母/
+        下划线）。>=0x80 的多字节邻居（汉字是单词字符、全角标点不是）
+        无法在字节层判定，一律先作为候选返回，由 _mask_phones 在 Python
+        侧用 \w 校验后再替换。一次编译后的线性扫描。
+        """
+        n = buf.shape[0]
+        out = np.empty(n // 11 + 1, dtype=np.int64)
+        k = 0
+        i = 0
+        while i < n:
+            if buf[i] == 0x31:  # '1'
+                prev_word = False
+                if i > 0:
+                    p = buf[i - 1]
+                    prev_word = (0x30 <= p <= 0x39) or (0x41 <= p <= 0x5A) \
+                        or (0x61 <= p <= 0x7A) or p == 0x5F
+                if not prev_word and i + 11 <= n:
+                    ok = True
+                    for j in range(1, 11):
+                        d = buf[i + j]
+                        if d < 0x30 or d > 0x39:
+                            ok = False
+                            break
+                    if ok:
+                        next_word = False
+                        if i + 11 < n:
+                            q = buf[i + 11]
+                            next_word = (0x30 <= q <= 0x39) or (0x41 <= q <= 0x5A) \
+                                or (0x61 <= q <= 0x7A) or q == 0x5F
+                        if not next_word:
+                            out[k] = i
+                            k += 1
+                            i += 11
+                            continue
+            i += 1
+        return out[:k]
+else:
+    _phone_starts = None
+
+# 短文本走 re 即可；JIT 路径只有在超大缓冲（整段导出级别）上才划算
+_NJIT_MIN_BYTES = 1 << 16
+
+
+def _is_word_neighbor(data: bytes, start: int, end: int) -> bool:
+    """判断候选号码某一侧的多字节邻居字符是否是 \\w（即不构成边界）。
+
+    start/end 是该侧第一个字节的偏移：向前/向后对齐到完整的 UTF-8
+    字符再解码，严格按 _PHONE_RE 的 Unicode \\b 语义判定。
+    """
+    if start > 0 and data[start] & 0xC0 == 0x80:
+        # end 侧传入的是字符首字节，start 侧可能落在延续字节上，回退到首字节
+        while start > 0 and data[start] & 0xC0 == 0x80:
+            start -= 1
+    while end < len(data) and data[end] & 0xC0 == 0x80:
+        end += 1
+    ch = data[start:end].decode('utf-8', errors='ignore')
+    return bool(ch) and _WORD_RE.match(ch) is not None
+
+
+def _mask_phones(text: str) -> str:
+    """把文本中的手机号替换为 [PHONE]。
+
+    常规消息走预编译正则；numba 可用且文本很大时，改用 JIT 的字节
+    状态机做单次扫描得到候选偏移，多字节邻居（汉字/全角标点）在
+    Python 侧按 \\w 校验后，从后往前原地替换——候选很少，线性扫描的
+    收益保留，而输出与 _PHONE_RE.sub 完全一致。
+    """
+    if _phone_starts is None or len(text) < _NJIT_MIN_BYTES:
+        return _PHONE_RE.sub('[PHONE]', text)
+    data = text.encode('utf-8')
+    starts = _phone_starts(np.frombuffer(data, dtype=np.uint8))
+    if starts.size == 0:
+        return text
+    out = bytearray(data)
+    n = len(data)
+    for i in range(starts.size - 1, -1, -1):
+        s = int(starts[i])
+        e = s + 11
+        # 扫描器只排除了 ASCII 单词邻居；>=0x80 的邻居在这里判定
+        if s > 0 and data[s - 1] >= 0x80 and _is_word_neighbor(data, s - 1, s):
+            continue
+        if e < n and data[e] >= 0x80 and _is_word_neighbor(data, e, e + 1):
+            continue
+        out[s:e] = b'[PHONE]'
+    return out.decode('utf-8')
+
+def parse_raw_chat(file_path: str) -> List[Dict[str, str]]:
     """
-    解析微信导出的纯文本，返回 DataFrame（columns: time, sender, content）
+    解析微信导出的纯文本，返回 list[dict]（keys: time, sender, content）
     解析规则需要根据你真实的导出格式做调整。
+
+    通过 mmap 获取文件的零拷贝字节视图，用多行正则单次扫描提取所有
+    消息（含多行消息），只对命中的分组做 UTF-8 解码——避免了文本模式
+    逐行解码和逐行分配字符串的开销（大文件导出时尤其明显）。
+    多行消息的延续行由正则一次性捕获，每条消息只做一次字符串分配，
+    不存在逐行 += 拼接的二次方开销。
+
+    整条流水线（解析 → 清洗 → 保存）都是顺序逐行访问，保持 list[dict]
+    表示即可，不需要 DataFrame 的列式物化；如需表格视图用 as_dataframe。
     """
-    rows = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            m = CHAT_LINE_RE.match(line)
-            if m:
-                rows.append(m.groupdict())
-            else:
-                # 非匹配行，可能是多行消息的延续，附加到上一个内容
-                if rows:
-                    rows[-1]['content'] += '\n' + line
-    df = pd.DataFrame(rows)
-    return df
-
-def clean_messages(df: pd.DataFrame) -> List[Dict]:
+    with open(file_path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法 mmap
+            return []
+        try:
+            rows = [
+                {
+                    'time': m['time'].decode('utf-8'),
+                    'sender': m['sender'].decode('utf-8'),
+                    'content': m['content'].decode('utf-8'),
+                }
+                for m in CHAT_LINE_RE.finditer(mm)
+            ]
+        finally:
+            mm.close()
+    return rows
+
+def clean_messages(rows: List[Dict[str, str]]) -> List[Dict]:
     """
     对消息进行进一步清洗（去除系统消息、表情替换、脱敏等）
     返回适合存储为 memory 的 list[dict]
     """
     memories = []
-    for _, row in df.iterrows():
+    for row in rows:
         content = row['content']
-        # 示例脱敏：替换手机号
-        content = re.sub(r'\b1\d{10}\b', '[PHONE]', content)
+        # 空消息/纯空白提前跳过，省掉两次正则调用
+        if not content or content.isspace():
+            continue
+        # 示例脱敏：替换手机号（没有 '1' 就不可能有手机号，跳过扫描）
+        if '1' in content:
+            content = _mask_phones(content)
         # 去除多余空白
-        content = re.sub(r'\s+', ' ', content).strip()
+        content = _WS_RE.sub(' ', content).strip()
         if not content:
             continue
         memories.append({
@@ -60,20 +196,53 @@ def clean_messages(df: pd.DataFrame) -> List[Dict]:
         })
     return memories
 
+
+def as_dataframe(memories: List[Dict]) -> pd.DataFrame:
+    """需要表格视图或做分析时，把消息列表转成 DataFrame"""
+    return pd.DataFrame(memories, columns=['time', 'sender', 'content'])
+
 def save_clean_memory(memories: List[Dict], out_path: str):
     p = Path(out_path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    with open(p, 'w', encoding='utf-8') as f:
-        json.dump(memories, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        # C 实现的编码器，直接输出 UTF-8 字节，比 stdlib 的缩进路径快一个量级
+        p.write_bytes(orjson.dumps(memories, option=orjson.OPT_INDENT_2))
+    else:
+        with open(p, 'w', encoding='utf-8') as f:
+            json.dump(memories, f, ensure_ascii=False, indent=2)
+
+def save_clean_memory_jsonl(memories: List[Dict], out_path: str):
+    """
+    按 JSONL（每行一个对象）流式写出。
+
+    大导出时不必像 save_clean_memory 那样先把整个列表序列化成一个大
+    字符串再落盘——每条消息编码后立即写出，内存占用与消息数无关，
+    下游也能用 jq 等工具流式消费。小规模演示仍可用缩进 JSON 版本。
+    """
+    p = Path(out_path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    with open(p, 'wb') as f:
+        if orjson is not None:
+            for m in memories:
+                f.write(orjson.dumps(m, option=orjson.OPT_APPEND_NEWLINE))
+        else:
+            for m in memories:
+                f.write(json.dumps(m, ensure_ascii=False).encode('utf-8'))
+                f.write(b'\n')
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument('--input', default='data/raw_chat.txt')
     parser.add_argument('--output', default='data/clean_memory.json')
+    parser.add_argument('--jsonl', action='store_true',
+                        help='按 JSONL（每行一个对象）流式写出，大导出时内存恒定')
     args = parser.parse_args()
 
-    df = parse_raw_chat(args.input)
-    memories = clean_messages(df)
-    save_clean_memory(memories, args.output)
+    rows = parse_raw_chat(args.input)
+    memories = clean_messages(rows)
+    if args.jsonl:
+        save_clean_memory_jsonl(memories, args.output)
+    else:
+        save_clean_memory(memories, args.output)
     print(f"Saved {len(memories)} messages to {args.output}")
\ No newline at end of file